@@ -1,9 +1,15 @@
 import os
+import hmac
 import math
 import sqlite3
+import threading
+from collections import namedtuple
 from datetime import date
 from functools import wraps
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, g
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from werkzeug.middleware.proxy_fix import ProxyFix
 from school_calendar import calculate_girls_food, calculate_days_until_25
 
 # ---------------------------------------------------------------------------
@@ -14,21 +20,89 @@ DATABASE_URL  = os.environ.get('DATABASE_URL', '')
 DATABASE_PATH = os.environ.get('DATABASE_PATH', 'budget.db')
 USE_POSTGRES  = bool(DATABASE_URL)
 
+if USE_POSTGRES:
+    from psycopg.pq import TransactionStatus
+    from psycopg.rows import dict_row, tuple_row
+    from psycopg_pool import ConnectionPool
+
+# Process-wide cache of settings values. Settings only change through
+# upsert_setting(), and DB.commit() drops the written keys, so reads can
+# skip the database entirely on a hit. Eviction only reaches this process,
+# which is why the Procfile pins gunicorn to one worker (--workers 1 also
+# overrides WEB_CONCURRENCY); a second worker would keep serving stale
+# balances until restarted.
+_settings_cache = {}
+
+# PostgreSQL connections are kept open in a pool and handed out per request,
+# which skips the TCP/auth handshake and lets psycopg's automatic server-side
+# prepared statements (prepare_threshold) carry over between requests.
+_pg_pool = None
+
+
+def _get_pg_pool():
+    global _pg_pool
+    if _pg_pool is None:
+        # check= probes each connection on checkout, so ones dropped by a
+        # server restart or idle timeout are replaced instead of failing a request
+        _pg_pool = ConnectionPool(DATABASE_URL, min_size=1, max_size=10,
+                                  kwargs={'row_factory': dict_row},
+                                  check=ConnectionPool.check_connection, open=True)
+    return _pg_pool
+
+
+def _close_pg_pool():
+    """Close the pool so the next _get_pg_pool() opens a fresh one. The pool
+    runs background threads, which don't survive fork(): a pool created at
+    import (init_db) must not be inherited by `gunicorn --preload` workers."""
+    global _pg_pool
+    if _pg_pool is not None:
+        _pg_pool.close()
+        _pg_pool = None
+
+
+# WAL is a persistent property of the database file, so it only needs to be
+# switched on once per process; the remaining pragmas are per connection.
+_sqlite_wal_enabled = False
+
+
+def _configure_sqlite(conn):
+    global _sqlite_wal_enabled
+    if not _sqlite_wal_enabled:
+        conn.execute("PRAGMA journal_mode=WAL")
+        _sqlite_wal_enabled = True
+    conn.execute("PRAGMA synchronous=NORMAL")     # fsync at checkpoints, not every commit
+    conn.execute("PRAGMA cache_size=-20000")      # ~20 MB page cache
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=134217728")    # 128 MB
+
+
+# SQLite connections are kept open too, one per thread, and reused across
+# requests — a request pays neither connect() nor the pragma setup above.
+_sqlite_local = threading.local()
+
+
+def _get_sqlite_conn():
+    conn = getattr(_sqlite_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DATABASE_PATH)
+        conn.row_factory = sqlite3.Row
+        _configure_sqlite(conn)
+        _sqlite_local.conn = conn
+    return conn
+
 
 class DB:
     """Thin wrapper that gives sqlite3 and psycopg2 a unified interface."""
 
     def __init__(self):
         if USE_POSTGRES:
-            import psycopg
-            from psycopg.rows import dict_row
-            self._conn   = psycopg.connect(DATABASE_URL, row_factory=dict_row)
+            self._conn   = _get_pg_pool().getconn()
             self._cursor = self._conn.cursor()
         else:
-            self._conn   = sqlite3.connect(DATABASE_PATH)
-            self._conn.row_factory = sqlite3.Row
+            self._conn   = _get_sqlite_conn()
             self._cursor = None   # sqlite3 uses conn.execute() shorthand
         self._last = None
+        self._dirty_settings = set()
 
     def execute(self, sql, params=()):
         if USE_POSTGRES:
@@ -39,22 +113,98 @@ class DB:
             self._last = self._conn.execute(sql, params)
         return self
 
+    def executemany(self, sql, seq_of_params):
+        if USE_POSTGRES:
+            sql = sql.replace('?', '%s')
+            self._cursor.executemany(sql, seq_of_params)
+            self._last = self._cursor
+        else:
+            self._last = self._conn.executemany(sql, seq_of_params)
+        return self
+
     def fetchone(self):
         return self._last.fetchone() if self._last else None
 
     def fetchall(self):
-        return self._last.fetchall() if self._last else []
+        # Materialise sqlite3.Row into plain dicts (psycopg's dict_row already
+        # is one) so templates get O(1) key lookups instead of a column scan.
+        if not self._last:
+            return []
+        rows = self._last.fetchall()
+        return rows if USE_POSTGRES else [dict(r) for r in rows]
+
+    def iter_tuples(self):
+        """Iterate the result as plain tuples in column order, straight off
+        the cursor — for hot loops that unpack rows positionally."""
+        if not self._last:
+            return
+        if USE_POSTGRES:
+            self._last.row_factory = tuple_row
+            try:
+                yield from self._last
+            finally:
+                self._last.row_factory = dict_row
+        else:
+            self._last.row_factory = None   # a fresh cursor per execute(), safe to change
+            yield from self._last
+
+    def fetchall_sum(self, column):
+        """Like fetchall(), but also returns the sum of one column, built in
+        the same pass over the cursor."""
+        rows, total = [], 0
+        if self._last:
+            for r in self._last:
+                r = r if USE_POSTGRES else dict(r)
+                total += r[column]
+                rows.append(r)
+        return rows, total
+
+    def begin(self):
+        """Open an explicit write transaction (psycopg opens one implicitly)."""
+        if not USE_POSTGRES and not self._conn.in_transaction:
+            self._conn.execute("BEGIN IMMEDIATE")
 
     def commit(self):
         self._conn.commit()
+        self._evict_dirty_settings()
+
+    def rollback(self):
+        self._conn.rollback()
+        self._evict_dirty_settings()
+
+    # `with db:` runs the block in one transaction — committed on success,
+    # rolled back if it raises.
+    def __enter__(self):
+        self.begin()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
+
+    def _evict_dirty_settings(self):
+        for key in self._dirty_settings:
+            _settings_cache.pop(key, None)
+        self._dirty_settings.clear()
 
     def close(self):
-        self._conn.close()
+        # Hand the connection back clean. psycopg opens a transaction on the
+        # first SELECT, so read-only requests end inside one too.
+        if USE_POSTGRES:
+            self._cursor.close()
+            if self._conn.info.transaction_status != TransactionStatus.IDLE:
+                self._conn.rollback()
+            _get_pg_pool().putconn(self._conn)
+        elif self._conn.in_transaction:
+            self._conn.rollback()
 
     # -- Helpers for INSERT OR REPLACE / INSERT OR IGNORE ----------------
 
     def upsert_setting(self, key, value):
         """Insert or update a row in the settings table."""
+        self._dirty_settings.add(key)
         if USE_POSTGRES:
             self.execute(
                 "INSERT INTO settings (key, value) VALUES (%s, %s) "
@@ -67,22 +217,48 @@ class DB:
                 (key, float(value))
             )
 
-    def insert_ignore_setting(self, key, value):
-        """Insert a setting only if it doesn't already exist."""
+    def insert_ignore_settings(self, items):
+        """Insert (key, value) settings that don't already exist."""
+        items = [(key, float(value)) for key, value in items]
+        self._dirty_settings.update(key for key, _ in items)
         if USE_POSTGRES:
-            self.execute(
+            self.executemany(
                 "INSERT INTO settings (key, value) VALUES (%s, %s) "
                 "ON CONFLICT (key) DO NOTHING",
-                (key, float(value))
+                items
             )
         else:
-            self.execute(
+            self.executemany(
                 "INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)",
-                (key, float(value))
+                items
             )
 
 app = Flask(__name__)
 app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-change-me')
+# Render terminates requests at its proxy; trust its single X-Forwarded-For hop
+# so request.remote_addr is the real client (the login limiter keys on it).
+# Only when actually behind a proxy — otherwise the header is client-supplied
+# and any caller could claim a fresh address on every attempt.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS',
+                                        1 if os.environ.get('RENDER') else 0))
+if TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXY_HOPS)
+
+# ---------------------------------------------------------------------------
+# Sessions — stored in Redis when REDIS_URL is set (production, shared across
+# workers); otherwise Flask's default signed cookie is used (dev/Codespace).
+# ---------------------------------------------------------------------------
+REDIS_URL = os.environ.get('REDIS_URL', '')
+
+if REDIS_URL:
+    import redis
+    from flask_session import Session
+    app.config.update(
+        SESSION_TYPE='redis',
+        SESSION_REDIS=redis.from_url(REDIS_URL),
+        SESSION_PERMANENT=False,
+    )
+    Session(app)
 
 # ---------------------------------------------------------------------------
 # Auth — password set via APP_PASSWORD env var.
@@ -90,6 +266,11 @@ app.secret_key = os.environ.get('SECRET_KEY', 'dev-secret-change-me')
 # ---------------------------------------------------------------------------
 APP_PASSWORD = os.environ.get('APP_PASSWORD', '')
 
+# Throttle password attempts per client IP. Counters live in Redis when it is
+# configured (shared across workers), otherwise in process memory.
+limiter = Limiter(get_remote_address, app=app,
+                  storage_uri=REDIS_URL or 'memory://')
+
 def login_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -99,9 +280,11 @@ def login_required(f):
     return decorated
 
 @app.route('/login', methods=['GET', 'POST'])
+@limiter.limit('5/minute', methods=['POST'])
 def login():
     if request.method == 'POST':
-        if request.form.get('password') == APP_PASSWORD:
+        password = request.form.get('password', '')
+        if hmac.compare_digest(password.encode(), APP_PASSWORD.encode()):
             session['logged_in'] = True
             return redirect(url_for('index'))
         return render_template('login.html', error=True)
@@ -114,160 +297,251 @@ def logout():
 # ---------------------------------------------------------------------------
 # Template — mirrors Column C of the Excel sheet "מתגלגל"
 # is_variable=1 → amount is entered manually at each month reset
+# Rows are in INSERT column order so init_db can hand them to executemany:
+#   (name, name_en, amount, debit_day, is_income, is_variable, sort_order)
 # ---------------------------------------------------------------------------
-EXPENSE_TEMPLATE = [
+EXPENSE_TEMPLATE = (
     # הכנסות
-    dict(name='משכורת תום',               name_en="Tom's salary",               amount=None,   debit_day=None, is_income=1, is_variable=1, sort_order=1),
-    dict(name='משכורת תמרי',              name_en="Tamari's salary",             amount=1200.0, debit_day=None, is_income=1, is_variable=0, sort_order=2),
-    dict(name='CAF ילדים',                name_en='CAF children',                amount=150.0,  debit_day=None, is_income=1, is_variable=0, sort_order=3),
-    dict(name='CAF דירה',                 name_en='CAF housing',                 amount=None,   debit_day=None, is_income=1, is_variable=1, sort_order=4),
-    dict(name='לקבל חזרה מביטוח רפואי',  name_en='Medical insurance refund',    amount=None,   debit_day=None, is_income=1, is_variable=1, sort_order=5),
-    dict(name='החזר מהעבודה',             name_en='Work reimbursement',          amount=None,   debit_day=None, is_income=1, is_variable=1, sort_order=6),
+    ('משכורת תום',             "Tom's salary",             None,   None, 1, 1, 1),
+    ('משכורת תמרי',            "Tamari's salary",          1200.0, None, 1, 0, 2),
+    ('CAF ילדים',              'CAF children',             150.0,  None, 1, 0, 3),
+    ('CAF דירה',               'CAF housing',              None,   None, 1, 1, 4),
+    ('לקבל חזרה מביטוח רפואי', 'Medical insurance refund', None,   None, 1, 1, 5),
+    ('החזר מהעבודה',           'Work reimbursement',       None,   None, 1, 1, 6),
     # הוצאות
-    dict(name='שכר דירה',                 name_en='Rent',                        amount=1683.0, debit_day=28,   is_income=0, is_variable=0, sort_order=7),
-    dict(name='חשבון חשמל',              name_en='EDF',                         amount=151.0,  debit_day=16,   is_income=0, is_variable=1, sort_order=8),
-    dict(name='נאביגו',                   name_en='Navigo',                      amount=230.0,  debit_day=6,    is_income=0, is_variable=1, sort_order=9),
-    dict(name='טלפונים ואינטרנט',         name_en='Phones & internet',           amount=95.0,   debit_day=None, is_income=0, is_variable=0, sort_order=10),
-    dict(name='ביטוח דירה',              name_en='Home insurance',              amount=13.0,   debit_day=19,   is_income=0, is_variable=0, sort_order=11),
-    dict(name='אוכל בנות',               name_en="Girls' school food",          amount=None,   debit_day=5,    is_income=0, is_variable=0, sort_order=12),
-    dict(name='עמלת בנק',                name_en='Bank fee',                    amount=22.0,   debit_day=5,    is_income=0, is_variable=0, sort_order=13),
-    dict(name='ביטוח בריאות',            name_en='Mutuelle',                    amount=210.0,  debit_day=None, is_income=0, is_variable=0, sort_order=14),
-    dict(name='משיכת מזומן',             name_en='Cash withdrawal',             amount=None,   debit_day=None, is_income=0, is_variable=1, sort_order=15),
-]
-
-SAVINGS_ITEMS = [
-    dict(name='בתוך העו"ש', amount=8700.0,  sort_order=1),
-    dict(name='פק"מ א',     amount=11728.0, sort_order=2),
-    dict(name='פק"מ ב',     amount=13739.0, sort_order=3),
-    dict(name='מניות',      amount=33570.0, sort_order=4),
-]
+    ('שכר דירה',               'Rent',                     1683.0, 28,   0, 0, 7),
+    ('חשבון חשמל',             'EDF',                      151.0,  16,   0, 1, 8),
+    ('נאביגו',                 'Navigo',                   230.0,  6,    0, 1, 9),
+    ('טלפונים ואינטרנט',       'Phones & internet',        95.0,   None, 0, 0, 10),
+    ('ביטוח דירה',             'Home insurance',           13.0,   19,   0, 0, 11),
+    ('אוכל בנות',              "Girls' school food",       None,   5,    0, 0, 12),
+    ('עמלת בנק',               'Bank fee',                 22.0,   5,    0, 0, 13),
+    ('ביטוח בריאות',           'Mutuelle',                 210.0,  None, 0, 0, 14),
+    ('משיכת מזומן',            'Cash withdrawal',          None,   None, 0, 1, 15),
+)
+
+# (name, amount, sort_order)
+SAVINGS_ITEMS = (
+    ('בתוך העו"ש', 8700.0,  1),
+    ('פק"מ א',     11728.0, 2),
+    ('פק"מ ב',     13739.0, 3),
+    ('מניות',      33570.0, 4),
+)
+
+# (key, value)
+DEFAULT_SETTINGS = (
+    ('balance',                 0.0),
+    ('future',                  0.0),
+    ('savings_ignore',          8700.0),
+    ('savings_ignore_at_reset', 8700.0),
+    ('girls_shachar',           500.0),
+    ('girls_yaara',             500.0),
+)
 
 # ---------------------------------------------------------------------------
 # Database helpers
 # ---------------------------------------------------------------------------
 
 def get_db():
-    return DB()
+    """One connection per app context, opened lazily and reused by every helper."""
+    if 'db' not in g:
+        g.db = DB()
+    return g.db
+
+
+@app.teardown_appcontext
+def close_db(exc):
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
 
 
 def get_setting(key, default=0.0):
+    if key in _settings_cache:
+        return _settings_cache[key]
     db = get_db()
     row = db.execute("SELECT value FROM settings WHERE key=?", (key,)).fetchone()
-    db.close()
-    return float(row['value']) if row else default
+    if not row:
+        return default
+    _settings_cache[key] = float(row['value'])
+    return _settings_cache[key]
+
+
+def get_settings(keys, default=0.0):
+    """Fetch several settings in one query; missing keys fall back to default."""
+    missing = [k for k in keys if k not in _settings_cache]
+    if missing:
+        db = get_db()
+        placeholders = ', '.join('?' * len(missing))
+        rows = db.execute(f"SELECT key, value FROM settings WHERE key IN ({placeholders})",
+                          tuple(missing)).fetchall()
+        for r in rows:
+            _settings_cache[r['key']] = float(r['value'])
+    return {k: _settings_cache.get(k, default) for k in keys}
 
 
 def set_setting(key, value):
-    db = get_db()
-    db.upsert_setting(key, value)
-    db.commit()
-    db.close()
+    with get_db() as db:
+        db.upsert_setting(key, value)
 
 
-def init_db():
-    db = get_db()
+def _case_by_id(column, values):
+    """SQL fragment + params setting column per row id from {id: value};
+    rows not in values keep their current value."""
+    if not values:
+        return column, ()
+    whens  = ' '.join('WHEN ? THEN ?' for _ in values)
+    params = tuple(p for item in values.items() for p in item)
+    return f"CASE id {whens} ELSE {column} END", params
 
-    # Primary key syntax differs between SQLite and PostgreSQL
-    PK = "SERIAL PRIMARY KEY" if USE_POSTGRES else "INTEGER PRIMARY KEY AUTOINCREMENT"
-
-    db.execute(f'''CREATE TABLE IF NOT EXISTS settings (
-        key   TEXT PRIMARY KEY,
-        value REAL NOT NULL DEFAULT 0
-    )''')
-
-    db.execute(f'''CREATE TABLE IF NOT EXISTS expense_template (
-        id          {PK},
-        name        TEXT NOT NULL,
-        name_en     TEXT,
-        amount      REAL,
-        debit_day   INTEGER,
-        is_income   INTEGER DEFAULT 0,
-        is_variable INTEGER DEFAULT 0,
-        sort_order  INTEGER DEFAULT 0
-    )''')
-
-    db.execute(f'''CREATE TABLE IF NOT EXISTS current_expenses (
-        id          {PK},
-        template_id INTEGER,
-        name        TEXT NOT NULL,
-        name_en     TEXT,
-        amount      REAL,
-        debit_day   INTEGER,
-        is_income   INTEGER DEFAULT 0,
-        is_variable INTEGER DEFAULT 0,
-        is_cleared  INTEGER DEFAULT 0,
-        sort_order  INTEGER DEFAULT 0
-    )''')
-
-    db.execute(f'''CREATE TABLE IF NOT EXISTS pending_transactions (
-        id         {PK},
-        name       TEXT NOT NULL,
-        amount     REAL NOT NULL,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )''')
-
-    db.execute(f'''CREATE TABLE IF NOT EXISTS savings (
-        id         {PK},
-        name       TEXT NOT NULL,
-        amount     REAL DEFAULT 0,
-        sort_order INTEGER DEFAULT 0
-    )''')
-
-    # Default settings
-    for key, value in [
-        ('balance', 0.0),
-        ('future', 0.0),
-        ('savings_ignore', 8700.0),
-        ('savings_ignore_at_reset', 8700.0),
-        ('girls_shachar', 500.0),
-        ('girls_yaara', 500.0),
-    ]:
-        db.insert_ignore_setting(key, value)
-
-    # Seed expense template if empty
-    count = db.execute("SELECT COUNT(*) as n FROM expense_template").fetchone()
-    if (count['n'] if USE_POSTGRES else count[0]) == 0:
-        for item in EXPENSE_TEMPLATE:
-            db.execute(
+
+# expense_template only changes through /settings and /month-reset, which
+# call invalidate_templates() after committing. Like _settings_cache, this
+# relies on the single gunicorn worker pinned in the Procfile.
+_template_cache = None
+
+
+def get_templates():
+    global _template_cache
+    if _template_cache is None:
+        _template_cache = get_db().execute(
+            "SELECT * FROM expense_template ORDER BY sort_order").fetchall()
+    return _template_cache
+
+
+def invalidate_templates():
+    global _template_cache
+    _template_cache = None
+
+
+def init_db():
+    # One transaction for the whole setup: a single commit, and on SQLite
+    # workers starting together queue on BEGIN IMMEDIATE instead of racing
+    # to seed.
+    with get_db() as db:
+        # Primary key syntax differs between SQLite and PostgreSQL
+        PK = "SERIAL PRIMARY KEY" if USE_POSTGRES else "INTEGER PRIMARY KEY AUTOINCREMENT"
+
+        db.execute(f'''CREATE TABLE IF NOT EXISTS settings (
+            key   TEXT PRIMARY KEY,
+            value REAL NOT NULL DEFAULT 0
+        )''')
+
+        db.execute(f'''CREATE TABLE IF NOT EXISTS expense_template (
+            id          {PK},
+            name        TEXT NOT NULL,
+            name_en     TEXT,
+            amount      REAL,
+            debit_day   INTEGER,
+            is_income   INTEGER DEFAULT 0,
+            is_variable INTEGER DEFAULT 0,
+            sort_order  INTEGER DEFAULT 0
+        )''')
+
+        db.execute(f'''CREATE TABLE IF NOT EXISTS current_expenses (
+            id          {PK},
+            template_id INTEGER,
+            name        TEXT NOT NULL,
+            name_en     TEXT,
+            amount      REAL,
+            debit_day   INTEGER,
+            is_income   INTEGER DEFAULT 0,
+            is_variable INTEGER DEFAULT 0,
+            is_cleared  INTEGER DEFAULT 0,
+            sort_order  INTEGER DEFAULT 0
+        )''')
+
+        db.execute(f'''CREATE TABLE IF NOT EXISTS pending_transactions (
+            id         {PK},
+            name       TEXT NOT NULL,
+            amount     REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )''')
+
+        db.execute(f'''CREATE TABLE IF NOT EXISTS savings (
+            id         {PK},
+            name       TEXT NOT NULL,
+            amount     REAL DEFAULT 0,
+            sort_order INTEGER DEFAULT 0
+        )''')
+
+        # Migrations for existing SQLite databases (not needed for fresh PostgreSQL)
+        if not USE_POSTGRES:
+            for table in ('expense_template', 'current_expenses'):
+                cols = {r['name'] for r in db.execute(f"PRAGMA table_info({table})").fetchall()}
+                if 'is_variable' not in cols:
+                    db.execute(f"ALTER TABLE {table} ADD COLUMN is_variable INTEGER DEFAULT 0")
+
+        # Indexes for the dashboard / list pages. idx_ce_grp_sort matches the
+        # dashboard UNION's "ORDER BY grp, sort_order" (grp = 1 - is_income).
+        db.execute("CREATE INDEX IF NOT EXISTS idx_ce_grp_sort ON current_expenses ((1 - is_income), sort_order)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_pending_created ON pending_transactions (created_at DESC)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_tmpl_sort ON expense_template (sort_order)")
+
+        # Default settings
+        db.insert_ignore_settings(DEFAULT_SETTINGS)
+
+        # Seed expense template if empty
+        count = db.execute("SELECT COUNT(*) as n FROM expense_template").fetchone()
+        if (count['n'] if USE_POSTGRES else count[0]) == 0:
+            db.executemany(
                 "INSERT INTO expense_template "
                 "(name, name_en, amount, debit_day, is_income, is_variable, sort_order) "
                 "VALUES (?, ?, ?, ?, ?, ?, ?)",
-                (item['name'], item['name_en'], item['amount'], item['debit_day'],
-                 item['is_income'], item['is_variable'], item['sort_order'])
+                EXPENSE_TEMPLATE
             )
 
-    # Seed savings if empty
-    count = db.execute("SELECT COUNT(*) as n FROM savings").fetchone()
-    if (count['n'] if USE_POSTGRES else count[0]) == 0:
-        for item in SAVINGS_ITEMS:
-            db.execute(
+        # Seed savings if empty
+        count = db.execute("SELECT COUNT(*) as n FROM savings").fetchone()
+        if (count['n'] if USE_POSTGRES else count[0]) == 0:
+            db.executemany(
                 "INSERT INTO savings (name, amount, sort_order) VALUES (?, ?, ?)",
-                (item['name'], item['amount'], item['sort_order'])
+                SAVINGS_ITEMS
             )
 
-    # Migrations for existing SQLite databases (not needed for fresh PostgreSQL)
-    if not USE_POSTGRES:
-        for col_sql in [
-            "ALTER TABLE expense_template ADD COLUMN is_variable INTEGER DEFAULT 0",
-            "ALTER TABLE current_expenses ADD COLUMN is_variable INTEGER DEFAULT 0",
-        ]:
-            try:
-                db.execute(col_sql)
-            except Exception:
-                pass
 
-    db.commit()
-    db.close()
+# *_sum are rounded per row for compute_remaining(); *_total are raw, for display
+Totals = namedtuple('Totals', 'income_sum expense_sum pending_sum '
+                              'income_total expense_total pending_total')
+
+
+def tally_dashboard(rows):
+    """One pass over the dashboard rows — (grp, amount, is_cleared, id, name,
+    debit_day, ...) tuples with grp 0 income, 1 expense, 2 pending — routing
+    each into its display list while folding the outstanding (not cleared)
+    sums. Income is floored per row, expenses and pending ceiled, as
+    compute_remaining() expects.
+
+    Returns (income_items, expense_items, pending_transactions, totals)."""
+    floor, ceil = math.floor, math.ceil
+    lists = ([], [], [])
+    income_sum = expense_sum = pending_sum = 0
+    income_total = expense_total = pending_total = 0
+    for grp, a, cleared, item_id, name, debit_day, _, _ in rows:
+        lists[grp].append({'id': item_id, 'name': name, 'amount': a,
+                           'debit_day': debit_day, 'is_cleared': cleared})
+        if not a or cleared:
+            continue
+        if grp == 0:
+            income_sum    += floor(a)
+            income_total  += a
+        elif grp == 1:
+            expense_sum   += ceil(a)
+            expense_total += a
+        else:
+            pending_sum   += ceil(a)
+            pending_total += a
+    totals = Totals(income_sum, expense_sum, pending_sum,
+                    income_total, expense_total, pending_total)
+    return lists + (totals,)
 
 
 def compute_remaining(balance, future, savings_ignore,
-                      income_items, expense_items, pending_transactions):
+                      income_sum, expense_sum, pending_sum):
     """Replicates Excel formula: SUM(B2:B10) - SUM(B12:B32)
     Conservative rounding: income floored, expenses ceiled, result floored.
-    savings_ignore already includes girls' money."""
-    income_sum  = sum(math.floor(r['amount']) for r in income_items  if not r['is_cleared'] and r['amount'])
-    expense_sum = sum(math.ceil(r['amount'])  for r in expense_items if not r['is_cleared'] and r['amount'])
-    pending_sum = sum(math.ceil(r['amount'])  for r in pending_transactions)
+    savings_ignore already includes girls' money.
+    The sums come from tally_dashboard(), already rounded per row."""
     raw = balance + future + income_sum - expense_sum - pending_sum - savings_ignore
     return math.floor(raw)
 
@@ -278,6 +552,8 @@ def compute_remaining(balance, future, savings_ignore,
 
 with app.app_context():
     init_db()
+# Each worker opens its own pool on its first request
+_close_pg_pool()
 
 
 # ---------------------------------------------------------------------------
@@ -288,29 +564,30 @@ with app.app_context():
 @login_required
 def index():
     conn = get_db()
-    income_items         = conn.execute("SELECT * FROM current_expenses WHERE is_income=1 ORDER BY sort_order").fetchall()
-    expense_items        = conn.execute("SELECT * FROM current_expenses WHERE is_income=0 ORDER BY sort_order").fetchall()
-    pending_transactions = conn.execute("SELECT * FROM pending_transactions ORDER BY created_at DESC").fetchall()
-    s = {r['key']: float(r['value']) for r in conn.execute("SELECT key, value FROM settings").fetchall()}
-    conn.close()
-
-    balance                 = s.get('balance', 0.0)
-    future                  = s.get('future', 0.0)
-    savings_ignore          = s.get('savings_ignore', 0.0)
-    savings_ignore_at_reset = s.get('savings_ignore_at_reset', 0.0)
-    girls_shachar           = s.get('girls_shachar', 0.0)
-    girls_yaara             = s.get('girls_yaara', 0.0)
+    # One round-trip for all three lists; grp tags the source: 0 income, 1 expense, 2 pending
+    rows = conn.execute(
+        "SELECT 1 - is_income AS grp, amount, is_cleared, id, name, debit_day, "
+        "sort_order, NULL AS created_at FROM current_expenses "
+        "UNION ALL "
+        "SELECT 2, amount, 0, id, name, NULL, 0, created_at FROM pending_transactions "
+        "ORDER BY grp, sort_order, created_at DESC").iter_tuples()
+    income_items, expense_items, pending_transactions, t = tally_dashboard(rows)
+    s = get_settings(('balance', 'future', 'savings_ignore', 'savings_ignore_at_reset',
+                      'girls_shachar', 'girls_yaara'))
+
+    balance                 = s['balance']
+    future                  = s['future']
+    savings_ignore          = s['savings_ignore']
+    savings_ignore_at_reset = s['savings_ignore_at_reset']
+    girls_shachar           = s['girls_shachar']
+    girls_yaara             = s['girls_yaara']
     girls_total             = girls_shachar + girls_yaara
 
     remaining = compute_remaining(balance, future, savings_ignore,
-                                  income_items, expense_items, pending_transactions)
+                                  t.income_sum, t.expense_sum, t.pending_sum)
     days    = calculate_days_until_25()
     per_day = math.floor(remaining / days) if days > 0 else 0
 
-    income_pending_total  = sum(r['amount'] for r in income_items  if not r['is_cleared'] and r['amount'])
-    expense_pending_total = sum(r['amount'] for r in expense_items if not r['is_cleared'] and r['amount'])
-    pending_total         = sum(r['amount'] for r in pending_transactions)
-
     today = date.today()
 
     return render_template('index.html',
@@ -320,9 +597,9 @@ def index():
         girls_shachar=girls_shachar, girls_yaara=girls_yaara, girls_total=girls_total,
         income_items=income_items, expense_items=expense_items,
         pending_transactions=pending_transactions,
-        income_pending_total=income_pending_total,
-        expense_pending_total=expense_pending_total,
-        pending_total=pending_total,
+        income_pending_total=t.income_total,
+        expense_pending_total=t.expense_total,
+        pending_total=t.pending_total,
         remaining=remaining, days=days, per_day=per_day,
         today=today, is_reset_due=(today.day >= 24),
     )
@@ -331,33 +608,27 @@ def index():
 @app.route('/update-balance', methods=['POST'])
 @login_required
 def update_balance():
-    conn = get_db()
-    for key in ('balance', 'future', 'savings_ignore'):
-        val = request.form.get(key, '').strip()
-        if val:
-            conn.upsert_setting(key, float(val))
-    conn.commit()
-    conn.close()
+    with get_db() as conn:
+        for key in ('balance', 'future', 'savings_ignore'):
+            val = request.form.get(key, '').strip()
+            if val:
+                conn.upsert_setting(key, float(val))
     return redirect(url_for('index'))
 
 
 @app.route('/clear-expense/<int:expense_id>', methods=['POST'])
 @login_required
 def clear_expense(expense_id):
-    conn = get_db()
-    conn.execute("UPDATE current_expenses SET is_cleared=1 WHERE id=?", (expense_id,))
-    conn.commit()
-    conn.close()
+    with get_db() as conn:
+        conn.execute("UPDATE current_expenses SET is_cleared=? WHERE id=?", (1, expense_id))
     return redirect(url_for('index'))
 
 
 @app.route('/unclear-expense/<int:expense_id>', methods=['POST'])
 @login_required
 def unclear_expense(expense_id):
-    conn = get_db()
-    conn.execute("UPDATE current_expenses SET is_cleared=0 WHERE id=?", (expense_id,))
-    conn.commit()
-    conn.close()
+    with get_db() as conn:
+        conn.execute("UPDATE current_expenses SET is_cleared=? WHERE id=?", (0, expense_id))
     return redirect(url_for('index'))
 
 
@@ -367,11 +638,9 @@ def update_expense_amount(expense_id):
     val = request.form.get('amount', '').strip()
     if val:
         try:
-            conn = get_db()
-            conn.execute("UPDATE current_expenses SET amount=? WHERE id=?",
-                         (float(val), expense_id))
-            conn.commit()
-            conn.close()
+            with get_db() as conn:
+                conn.execute("UPDATE current_expenses SET amount=? WHERE id=?",
+                             (float(val), expense_id))
         except ValueError:
             pass
     return redirect(url_for('index'))
@@ -381,10 +650,8 @@ def update_expense_amount(expense_id):
 @login_required
 def pending_mobile():
     conn = get_db()
-    pending_transactions = conn.execute(
-        "SELECT * FROM pending_transactions ORDER BY created_at DESC").fetchall()
-    conn.close()
-    total = sum(r['amount'] for r in pending_transactions)
+    pending_transactions, total = conn.execute(
+        "SELECT * FROM pending_transactions ORDER BY created_at DESC").fetchall_sum('amount')
     return render_template('pending_mobile.html',
         pending_transactions=pending_transactions, total=total)
 
@@ -396,11 +663,9 @@ def add_pending():
     amount = request.form.get('amount', '').strip()
     if name and amount:
         try:
-            conn = get_db()
-            conn.execute("INSERT INTO pending_transactions (name, amount) VALUES (?, ?)",
-                         (name, float(amount)))
-            conn.commit()
-            conn.close()
+            with get_db() as conn:
+                conn.execute("INSERT INTO pending_transactions (name, amount) VALUES (?, ?)",
+                             (name, float(amount)))
         except ValueError:
             pass
     return redirect(url_for('index'))
@@ -409,10 +674,8 @@ def add_pending():
 @app.route('/delete-pending/<int:pending_id>', methods=['POST'])
 @login_required
 def delete_pending(pending_id):
-    conn = get_db()
-    conn.execute("DELETE FROM pending_transactions WHERE id=?", (pending_id,))
-    conn.commit()
-    conn.close()
+    with get_db() as conn:
+        conn.execute("DELETE FROM pending_transactions WHERE id=?", (pending_id,))
     return redirect(url_for('index'))
 
 
@@ -423,85 +686,75 @@ def month_reset():
 
     if request.method == 'POST':
         food_cost = calculate_girls_food(today.year, today.month)
-        conn = get_db()
-
-        conn.execute("DELETE FROM current_expenses")
-        if request.form.get('clear_pending'):
-            conn.execute("DELETE FROM pending_transactions")
-
-        # Freeze savings_ignore at the time of reset
-        row = conn.execute("SELECT value FROM settings WHERE key='savings_ignore'").fetchone()
-        current_savings_ignore = float(row['value']) if row else 0.0
-        conn.upsert_setting('savings_ignore_at_reset', current_savings_ignore)
-
-        templates = conn.execute("SELECT * FROM expense_template ORDER BY sort_order").fetchall()
-        for t in templates:
-            if t['name'] == 'אוכל בנות':
-                amount = food_cost
-            else:
-                val = request.form.get(f'amount_{t["id"]}', '').strip()
-                amount = float(val) if val else t['amount']
-                # Save back to template as new default
-                conn.execute("UPDATE expense_template SET amount=? WHERE id=?",
-                             (amount, t['id']))
-
+        with get_db() as conn:
+            conn.execute("DELETE FROM current_expenses")
+            if request.form.get('clear_pending'):
+                conn.execute("DELETE FROM pending_transactions")
+
+            # Freeze savings_ignore at the time of reset
+            current_savings_ignore = get_setting('savings_ignore')
+            conn.upsert_setting('savings_ignore_at_reset', current_savings_ignore)
+
+            # Save amounts entered in the form back to the template as new defaults
+            updates = []
+            for key, value in request.form.items():
+                if key.startswith('amount_') and value.strip():
+                    updates.append((float(value.strip()), int(key.split('_')[1]), 'אוכל בנות'))
+            conn.executemany("UPDATE expense_template SET amount=? WHERE id=? AND name<>?", updates)
+
+            # Copy the template into this month's expenses inside the engine
             conn.execute(
                 "INSERT INTO current_expenses "
                 "(template_id, name, name_en, amount, debit_day, is_income, is_variable, sort_order) "
-                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
-                (t['id'], t['name'], t['name_en'], amount,
-                 t['debit_day'], t['is_income'], t['is_variable'], t['sort_order'])
+                "SELECT id, name, name_en, amount, debit_day, is_income, is_variable, sort_order "
+                "FROM expense_template ORDER BY sort_order"
             )
-
-        conn.commit()
-        conn.close()
+            conn.execute("UPDATE current_expenses SET amount=? WHERE name=?",
+                         (food_cost, 'אוכל בנות'))
+        invalidate_templates()
 
         flash(f'Month reset for {today.strftime("%B %Y")} complete! '
               f"Girls' food: \u20ac{food_cost:.2f}", 'success')
         return redirect(url_for('index'))
 
     food_cost = calculate_girls_food(today.year, today.month)
-    conn = get_db()
-    templates = conn.execute("SELECT * FROM expense_template ORDER BY sort_order").fetchall()
-    conn.close()
-
     return render_template('month_reset.html',
-        today=today, food_cost=food_cost, templates=templates)
+        today=today, food_cost=food_cost, templates=get_templates())
 
 
 @app.route('/savings', methods=['GET', 'POST'])
 @login_required
 def savings():
     if request.method == 'POST':
-        conn = get_db()
-        for key, value in request.form.items():
-            if key.startswith('saving_'):
-                sid    = int(key.split('_')[1])
-                val    = value.strip()
-                amount = float(val) if val else 0.0
-                conn.execute("UPDATE savings SET amount=? WHERE id=?", (amount, sid))
-                row = conn.execute("SELECT name FROM savings WHERE id=?", (sid,)).fetchone()
-                if row and row['name'] == 'בתוך העו"ש':
-                    conn.upsert_setting('savings_ignore', amount)
-        for key in ('girls_shachar', 'girls_yaara'):
-            val = request.form.get(key, '').strip()
-            if val:
-                conn.upsert_setting(key, float(val))
-        conn.commit()
-        conn.close()
+        with get_db() as conn:
+            names   = {r['id']: r['name'] for r in conn.execute("SELECT id, name FROM savings").fetchall()}
+            updates = []
+            for key, value in request.form.items():
+                if key.startswith('saving_'):
+                    sid    = int(key.split('_')[1])
+                    val    = value.strip()
+                    amount = float(val) if val else 0.0
+                    updates.append((amount, sid))
+                    if names.get(sid) == 'בתוך העו"ש':
+                        conn.upsert_setting('savings_ignore', amount)
+            conn.executemany("UPDATE savings SET amount=? WHERE id=?", updates)
+            for key in ('girls_shachar', 'girls_yaara'):
+                val = request.form.get(key, '').strip()
+                if val:
+                    conn.upsert_setting(key, float(val))
         flash('Savings updated!', 'success')
         return redirect(url_for('savings'))
 
     conn = get_db()
-    savings_items = conn.execute("SELECT * FROM savings ORDER BY sort_order").fetchall()
-    s = {r['key']: float(r['value']) for r in conn.execute("SELECT key, value FROM settings").fetchall()}
-    conn.close()
+    savings_items, savings_total = conn.execute(
+        "SELECT * FROM savings ORDER BY sort_order").fetchall_sum('amount')
+    s = get_settings(('girls_shachar', 'girls_yaara'))
 
     return render_template('savings.html',
         savings_items=savings_items,
-        savings_total=sum(s['amount'] for s in savings_items),
-        girls_shachar=s.get('girls_shachar', 0.0),
-        girls_yaara=s.get('girls_yaara', 0.0),
+        savings_total=savings_total,
+        girls_shachar=s['girls_shachar'],
+        girls_yaara=s['girls_yaara'],
     )
 
 
@@ -509,38 +762,34 @@ def savings():
 @login_required
 def settings():
     if request.method == 'POST':
-        conn = get_db()
-        for key, value in request.form.items():
-            if key.startswith('amount_'):
-                tid = int(key.split('_')[1])
-                val = value.strip()
-                conn.execute("UPDATE expense_template SET amount=? WHERE id=?",
-                             (float(val) if val else None, tid))
-            elif key.startswith('day_'):
-                tid = int(key.split('_')[1])
-                val = value.strip()
-                conn.execute("UPDATE expense_template SET debit_day=? WHERE id=?",
-                             (int(val) if val else None, tid))
-            elif key.startswith('variable_'):
-                tid = int(key.split('_')[1])
-                conn.execute("UPDATE expense_template SET is_variable=1 WHERE id=?", (tid,))
-        # Unset is_variable for unchecked boxes
-        all_tids = [row['id'] for row in conn.execute("SELECT id FROM expense_template").fetchall()]
-        checked  = {int(k.split('_')[1]) for k in request.form if k.startswith('variable_')}
-        for tid in all_tids:
-            if tid not in checked:
-                conn.execute("UPDATE expense_template SET is_variable=0 WHERE id=?", (tid,))
-        conn.commit()
-        conn.close()
+        with get_db() as conn:
+            amounts, days, checked = {}, {}, []
+            for key, value in request.form.items():
+                if key.startswith('amount_'):
+                    val = value.strip()
+                    amounts[int(key.split('_')[1])] = float(val) if val else None
+                elif key.startswith('day_'):
+                    val = value.strip()
+                    days[int(key.split('_')[1])] = int(val) if val else None
+                elif key.startswith('variable_'):
+                    checked.append(int(key.split('_')[1]))
+            # The whole form in one statement; unchecked boxes unset is_variable
+            amount_sql, amount_params = _case_by_id('amount', amounts)
+            day_sql, day_params       = _case_by_id('debit_day', days)
+            if checked:
+                placeholders = ', '.join('?' * len(checked))
+                variable_sql = f"CASE WHEN id IN ({placeholders}) THEN 1 ELSE 0 END"
+            else:
+                variable_sql = "0"
+            conn.execute(f"UPDATE expense_template SET amount = {amount_sql}, "
+                         f"debit_day = {day_sql}, is_variable = {variable_sql}",
+                         amount_params + day_params + tuple(checked))
+        invalidate_templates()
         flash('Settings saved!', 'success')
         return redirect(url_for('settings'))
 
-    conn = get_db()
-    templates = conn.execute("SELECT * FROM expense_template ORDER BY sort_order").fetchall()
-    conn.close()
-    return render_template('settings.html', templates=templates)
+    return render_template('settings.html', templates=get_templates())
 
 
 if __name__ == '__main__':
-    init_db()
     app.run(debug=True)
@@ -1,5 +1,7 @@
-from datetime import date
+from bisect import bisect_left
+from datetime import date, timedelta
 from calendar import monthrange
+from functools import lru_cache
 
 # Zone C (Versailles / Île-de-France) school holidays 2025-2026
 # Each tuple is (first_day_of_vacation, last_day_of_vacation) inclusive.
@@ -29,43 +31,70 @@ PUBLIC_HOLIDAYS = {
 }
 
 
+def _expand_non_school_days():
+    days = set(PUBLIC_HOLIDAYS)
+    for start, end in SCHOOL_HOLIDAYS:
+        d = start
+        while d <= end:
+            days.add(d)
+            d += timedelta(days=1)
+    return frozenset(days)
+
+
+# Every vacation day and public holiday, expanded once at import
+NON_SCHOOL_DAYS = _expand_non_school_days()
+_NON_SCHOOL_ORDINALS = frozenset(d.toordinal() for d in NON_SCHOOL_DAYS)
+
+# Weekdays with canteen meals: Mon, Tue, Thu, Fri (no school lunch on Wednesday)
+CANTEEN_WEEKDAYS = frozenset({0, 1, 3, 4})
+
+# Day ordinals start on a Monday (ordinal 1), so (ordinal - 1) % 7 is the weekday.
+# Sorted ordinals of non-school days that would otherwise be canteen days.
+_NON_SCHOOL_CANTEEN_ORDINALS = tuple(sorted(
+    o for o in _NON_SCHOOL_ORDINALS if (o - 1) % 7 in CANTEEN_WEEKDAYS))
+
+
+def _count_canteen_days(first, last):
+    """Canteen school days in the ordinal range [first, last): whole weeks
+    are counted arithmetically and holidays via binary search, so the cost
+    doesn't depend on the length of the range."""
+    weeks, extra = divmod(last - first, 7)
+    count = weeks * len(CANTEEN_WEEKDAYS)
+    count += sum(1 for o in range(first, first + extra)
+                 if (o - 1) % 7 in CANTEEN_WEEKDAYS)
+    holidays = _NON_SCHOOL_CANTEEN_ORDINALS
+    return count - (bisect_left(holidays, last) - bisect_left(holidays, first))
+
+
 def is_school_day(d):
     """Returns True if d is a regular school day."""
     if d.weekday() >= 5:        # Saturday or Sunday
         return False
-    if d in PUBLIC_HOLIDAYS:    # Public holiday
-        return False
-    for start, end in SCHOOL_HOLIDAYS:
-        if start <= d <= end:   # School vacation
-            return False
-    return True
+    return d not in NON_SCHOOL_DAYS
 
 
+@lru_cache(maxsize=64)
 def calculate_girls_food(year, month):
     """
     Calculate girls' school canteen cost for a given month.
     Counts school days that are NOT Wednesday, multiplied by 2 × €5.10 = €10.20/day.
     (Two meals per non-Wednesday school day at €5.10 each.)
     """
-    days_in_month = monthrange(year, month)[1]
-    count = 0
-    for day in range(1, days_in_month + 1):
-        d = date(year, month, day)
-        if d.weekday() == 2:    # Wednesday — no canteen
-            continue
-        if is_school_day(d):
-            count += 1
+    first = date(year, month, 1).toordinal()
+    count = _count_canteen_days(first, first + monthrange(year, month)[1])
     return round(count * 10.2, 2)
 
 
 def calculate_days_until_25():
     """Days remaining until the 25th of this month (or next month if past 25th)."""
-    today = date.today()
+    return _days_until_25(date.today().toordinal())
+
+
+@lru_cache(maxsize=2)
+def _days_until_25(today_ordinal):
+    """Cached per calendar day — the answer only changes at midnight."""
+    today = date.fromordinal(today_ordinal)
     if today.day < 25:
         return 25 - today.day
-    else:
-        if today.month == 12:
-            next_25 = date(today.year + 1, 1, 25)
-        else:
-            next_25 = date(today.year, today.month + 1, 25)
-        return (next_25 - today).days
+    # Rest of this month, then 25 days into the next
+    return monthrange(today.year, today.month)[1] - today.day + 25
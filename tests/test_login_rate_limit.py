@@ -0,0 +1,42 @@
+import os
+import sys
+import tempfile
+
+os.environ['DATABASE_PATH'] = os.path.join(tempfile.mkdtemp(), 'budget.db')
+os.environ['APP_PASSWORD'] = 'secret'
+os.environ.pop('TRUSTED_PROXY_HOPS', None)
+os.environ.pop('RENDER', None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.middleware.proxy_fix import ProxyFix  # noqa: E402
+
+import app as budget_app  # noqa: E402
+
+
+def login(client, password, forwarded_for):
+    return client.post('/login', data={'password': password},
+                       headers={'X-Forwarded-For': forwarded_for},
+                       environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code
+
+
+def test_spoofed_forwarded_for_is_ignored_without_trusted_proxy():
+    budget_app.limiter.reset()
+    client = budget_app.app.test_client()
+
+    # A new X-Forwarded-For on every attempt must not buy a new budget
+    codes = [login(client, 'wrong', f'203.0.113.{i}') for i in range(6)]
+    assert codes == [200] * 5 + [429]
+
+
+def test_forwarded_clients_are_limited_separately(monkeypatch):
+    # What TRUSTED_PROXY_HOPS=1 (or RENDER) sets up at import
+    monkeypatch.setattr(budget_app.app, 'wsgi_app',
+                        ProxyFix(budget_app.app.wsgi_app, x_for=1))
+    budget_app.limiter.reset()
+    client = budget_app.app.test_client()
+
+    codes = [login(client, 'wrong', '203.0.113.5') for _ in range(6)]
+    assert codes == [200] * 5 + [429]
+
+    # Same proxy address, different client: its own budget, owner not locked out
+    assert login(client, 'secret', '198.51.100.7') == 302
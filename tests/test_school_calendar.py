@@ -0,0 +1,58 @@
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from school_calendar import _count_canteen_days, calculate_girls_food, is_school_day  # noqa: E402
+
+
+def brute_force(first, last):
+    """Canteen days in [first, last) counted one date at a time."""
+    d, n = first, 0
+    while d < last:
+        if is_school_day(d) and d.weekday() != 2:
+            n += 1
+        d += timedelta(days=1)
+    return n
+
+
+def count(first, last):
+    return _count_canteen_days(first.toordinal(), last.toordinal())
+
+
+def test_every_month_matches_brute_force():
+    for year in range(1990, 2040):
+        for month in range(1, 13):
+            first = date(year, month, 1)
+            last = date(year + month // 12, month % 12 + 1, 1)
+            assert calculate_girls_food(year, month) == round(brute_force(first, last) * 10.2, 2), \
+                (year, month)
+
+
+def test_holiday_edges():
+    cases = [
+        (date(2025, 10, 18), date(2025, 11, 3)),   # Toussaint, starts on a Saturday
+        (date(2025, 10, 22), date(2025, 10, 23)),  # a Wednesday inside a vacation
+        (date(2025, 11, 1), date(2025, 11, 2)),    # public holiday on a Saturday
+        (date(2026, 8, 15), date(2026, 8, 16)),    # another on a Saturday
+        (date(2025, 11, 11), date(2025, 11, 12)),  # weekday public holiday
+        (date(2025, 12, 31), date(2026, 1, 6)),    # Noël, spanning the new year
+        (date(2025, 12, 1), date(2026, 2, 1)),
+        (date(2026, 5, 14), date(2026, 5, 18)),    # Ascension bridge
+        (date(2026, 3, 1), date(2026, 3, 1)),      # empty range
+    ]
+    for first, last in cases:
+        assert count(first, last) == brute_force(first, last), (first, last)
+
+
+def test_random_ranges_match_brute_force():
+    rng = random.Random(0)
+    windows = [(date(1990, 1, 1), date(2039, 12, 31)),
+               (date(2025, 6, 1), date(2026, 10, 1))]   # where the holidays are
+    for i in range(3000):
+        lo, hi = windows[i % 2]
+        first = date.fromordinal(rng.randrange(lo.toordinal(), hi.toordinal()))
+        last = first + timedelta(days=rng.randrange(0, 800))
+        assert count(first, last) == brute_force(first, last), (first, last)